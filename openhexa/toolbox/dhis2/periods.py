@@ -1,5 +1,5 @@
 import math
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Union
 
 from dateutil.relativedelta import relativedelta
@@ -66,7 +66,7 @@ class Day(Period):
 
     def __init__(self, period: Union[str, datetime]):
         super().__init__(period)
-        self._delta = relativedelta(days=1)
+        self._delta = timedelta(days=1)
 
     @staticmethod
     def check_period(period: str):
@@ -90,7 +90,7 @@ class Week(Period):
 
     def __init__(self, period: Union[str, datetime]):
         super().__init__(period)
-        self._delta = relativedelta(weeks=1)
+        self._delta = timedelta(weeks=1)
 
     @staticmethod
     def check_period(period: str):
@@ -1,17 +1,24 @@
 """Module for spatial and temporal aggregation of ERA5 data."""
 
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 
 import geopandas as gpd
 import numpy as np
 import polars as pl
 import rasterio
+import shapely
 import xarray as xr
-from epiweeks import Week
+from rasterio.enums import MergeAlg
 from rasterio.features import rasterize
 from rasterio.transform import Affine, from_bounds
 
+from .utils import get_grib_index
+
 
 def clip_dataset(ds: xr.Dataset, xmin: float, ymin: float, xmax: float, ymax: float) -> xr.Dataset:
     """Clip input xarray dataset according to the provided bounding box.
@@ -91,22 +98,126 @@ def build_masks(
     Returns
     -------
     np.ndarray
-        Binary masks as a numpy ndarray of shape (n_boundaries, height, width)
+        Binary masks as a read-only numpy ndarray of shape (n_boundaries, height, width). Use
+        `masks.copy()` to get a writable array.
+
+    Notes
+    -----
+    Masks are cached in memory for the last two combinations of geometries and grids, as the same
+    boundaries are usually aggregated over many ERA5 files sharing the same grid. The same array
+    is returned for identical inputs. Use `build_masks.cache_clear()` to free the cached masks.
     """
-    masks = np.ndarray(shape=(len(boundaries), height, width), dtype=np.bool_)
-    for i, geom in enumerate(boundaries.geometry):
-        mask = rasterize(
-            shapes=[geom.__geo_interface__],
+    wkb = tuple(shapely.to_wkb(np.asarray(boundaries.geometry.values)))
+    return _build_masks(wkb, height, width, transform)
+
+
+@lru_cache(maxsize=2)
+def _build_masks(wkb: tuple[bytes, ...], height: int, width: int, transform: rasterio.Affine) -> np.ndarray:
+    """Build binary masks for WKB geometries (see `build_masks()`)."""
+    n = len(wkb)
+    if n == 0:
+        return np.zeros(shape=(0, height, width), dtype=np.bool_)
+
+    shapes = shapely.from_wkb(np.asarray(wkb, dtype=object))
+    geoms = [geom.__geo_interface__ for geom in shapes]
+
+    # count the boundaries touching each pixel: if no pixel is shared between boundaries, all masks
+    # can be derived from a single raster of boundary labels instead of one rasterization per boundary
+    counts = rasterize(
+        shapes=[(geom, 1) for geom in geoms],
+        out_shape=(height, width),
+        fill=0,
+        all_touched=True,
+        transform=transform,
+        merge_alg=MergeAlg.add,
+        dtype=np.uint32,
+    )
+    if counts.max() <= 1:
+        labels = rasterize(
+            shapes=zip(geoms, range(1, n + 1)),
             out_shape=(height, width),
             fill=0,
-            default_value=1,
             all_touched=True,
             transform=transform,
+            dtype=np.uint32,
         )
-        masks[i, :, :] = mask == 1
+        masks = labels[np.newaxis, :, :] == np.arange(1, n + 1, dtype=np.uint32)[:, np.newaxis, np.newaxis]
+        masks.flags.writeable = False
+        return masks
+
+    # overlapping boundaries cannot share a labeled raster: split them into layers of boundaries that
+    # cannot touch the same pixel, and rasterize the labels of each layer at once
+    masks = np.ndarray(shape=(n, height, width), dtype=np.bool_)
+
+    def rasterize_layer(layer: np.ndarray) -> None:
+        values = (layer + 1).astype(np.uint32)
+        labels = rasterize(
+            shapes=zip([geoms[i] for i in layer], values.tolist()),
+            out_shape=(height, width),
+            fill=0,
+            all_touched=True,
+            transform=transform,
+            dtype=np.uint32,
+        )
+        masks[layer, :, :] = labels[np.newaxis, :, :] == values[:, np.newaxis, np.newaxis]
+
+    # layers are independent and GDAL releases the GIL while rasterizing: process them concurrently,
+    # each layer writing to its own rows of the masks array
+    with ThreadPoolExecutor() as executor:
+        list(executor.map(rasterize_layer, _mask_layers(shapes, transform)))
+    masks.flags.writeable = False
     return masks
 
 
+build_masks.cache_clear = _build_masks.cache_clear
+
+
+def _mask_layers(geoms: np.ndarray, transform: rasterio.Affine) -> list[np.ndarray]:
+    """Split boundaries into layers of boundaries that cannot touch the same pixel.
+
+    Two boundaries whose bounding boxes, extended by one pixel, do not intersect cannot touch the
+    same pixel. Layers are built by greedy coloring of the graph of intersecting bounding boxes,
+    so that their number is close to the maximum number of neighbours of a boundary rather than
+    the number of boundaries.
+
+    Parameters
+    ----------
+    geoms : np.ndarray
+        Boundaries geometries.
+    transform : rasterio.Affine
+        Raster affine transform
+
+    Returns
+    -------
+    list[np.ndarray]
+        Indexes of the boundaries in each layer.
+    """
+    xres, yres = abs(transform.a), abs(transform.e)
+    bounds = shapely.bounds(geoms) + [-xres, -yres, xres, yres]
+    boxes = shapely.box(*bounds.T)
+    src, dst = shapely.STRtree(boxes).query(boxes)
+
+    neighbours = [[] for _ in range(len(boxes))]
+    for i, j in zip(src, dst):
+        if i != j:
+            neighbours[i].append(j)
+
+    colors = np.full(len(boxes), -1)
+    for i in range(len(boxes)):
+        used = {colors[j] for j in neighbours[i]}
+        color = 0
+        while color in used:
+            color += 1
+        colors[i] = color
+
+    return [np.flatnonzero(colors == color) for color in range(colors.max() + 1)]
+
+
+def _open_grib(fp: Path) -> xr.Dataset:
+    """Open a GRIB file, reusing its persisted cfgrib index if available."""
+    return xr.open_dataset(fp, engine="cfgrib", backend_kwargs={"indexpath": get_grib_index(fp).as_posix()})
+
+
 def merge(data_dir: Path | str) -> xr.Dataset:
     """Merge all .grib files in a directory into a single xarray dataset.
 
@@ -126,11 +237,22 @@ def merge(data_dir: Path | str) -> xr.Dataset:
     if isinstance(data_dir, str):
         data_dir = Path(data_dir)
 
-    files = data_dir.glob("*.grib")
-    ds = xr.open_dataset(next(files), engine="cfgrib")
+    # opening a GRIB file decodes its messages to build the index: open all files concurrently
+    with ThreadPoolExecutor() as executor:
+        datasets = list(executor.map(_open_grib, sorted(data_dir.glob("*.grib"))))
+
+    # concatenate all files at once along the time dimension, instead of merging them one by one
+    # which would copy the accumulated dataset for each file
+    ds = xr.concat(datasets, dim="time")
 
-    for f in files:
-        ds = xr.concat([ds, xr.open_dataset(f, engine="cfgrib")], dim="tmp_dim").max(dim="tmp_dim")
+    # keep the maximum value if the same time is available in multiple files
+    # files are sorted by name (i.e. by date) so the time index is usually already sorted, in which
+    # case we avoid copying the dataset to sort it
+    times = ds.indexes["time"]
+    if times.has_duplicates:
+        ds = ds.groupby("time").max()
+    elif not times.is_monotonic_increasing:
+        ds = ds.sortby("time")
 
     return ds
 
@@ -144,35 +266,26 @@ def _np_to_datetime(dt64: np.datetime64) -> datetime:
 
 def _has_missing_data(da: xr.DataArray) -> bool:
     """A DataArray is considered to have missing data if not all hours have measurements."""
-    missing = False
-
-    # if da.step.size == 1, da.step is just an int so we cannot iterate over it
-    # if da.step size > 1, da.step is an array of int (one per step)
+    # if da.step.size == 1, da.step is just an int and is not a dimension of the array
+    # if da.step size > 1, check all steps at once instead of selecting them one by one
     if da.step.size > 1:
-        for step in da.step:
-            if da.sel(step=step).isnull().all():
-                missing = True
-    else:
-        missing = da.isnull().all()
-
-    return missing
-
+        dims = [dim for dim in da.dims if dim != "step"]
+        return bool(da.isnull().all(dim=dims).any())
 
-def _week(date: datetime) -> str:
-    year = date.isocalendar()[0]
-    week = date.isocalendar()[1]
-    return f"{year}W{week}"
+    return bool(da.isnull().all())
 
 
-def _epi_week(date: datetime) -> str:
-    epiweek = Week.fromdate(date)
-    year = epiweek.year
-    week = epiweek.week
-    return f"{year}W{week}"
+def _epi_week(date: pl.Expr) -> pl.Expr:
+    """Get the epidemiological week of a date column, as a DHIS2 period string.
 
-
-def _month(date: datetime) -> str:
-    return date.strftime("%Y%m")
+    CDC epidemiological weeks start on Sunday and the first week of the year is the first one with at
+    least 4 days in January. As with ISO weeks (for which the deciding day is Thursday), the week
+    therefore belongs to the year of its middle day, Wednesday, and its number can be derived from
+    the ordinal day of that Wednesday.
+    """
+    # polars weekdays range from 1 (monday) to 7 (sunday)
+    wednesday = date + pl.duration(days=3 - date.dt.weekday() % 7)
+    return pl.format("{}W{}", wednesday.dt.year(), (wednesday.dt.ordinal_day() - 1) // 7 + 1)
 
 
 def aggregate(ds: xr.Dataset, var: str, masks: np.ndarray, boundaries_id: list[str]) -> pl.DataFrame:
@@ -200,10 +313,32 @@ def aggregate(ds: xr.Dataset, var: str, masks: np.ndarray, boundaries_id: list[s
     daily means, average of daily min, and average of daily max. These 3 statistics are stored in
     the "mean", "min", and "max" columns of the output dataframe.
     """
-    rows = []
+    SCHEMA = {
+        "boundary_id": pl.String,
+        "date": pl.Date,
+        "mean": pl.Float64,
+        "min": pl.Float64,
+        "max": pl.Float64,
+    }
+
+    # one dataframe per day, built from the statistics arrays rather than from one dict per row
+    frames = []
+    ids = pl.Series("boundary_id", boundaries_id, dtype=pl.String)
+
+    # masks as a sparse list of (boundary, pixel) pairs: spatial sums become a single weighted bincount
+    # per day instead of one masked reduction per boundary
+    n = len(boundaries_id)
+    mask_boundaries, mask_pixels = np.nonzero(masks.reshape(n, -1))
+
+    # pairs are sorted by boundary, so that min & max can be computed for all boundaries in a single
+    # sweep with reduceat, given the index of the first pixel of each (non-empty) boundary
+    nonempty = np.flatnonzero(np.bincount(mask_boundaries, minlength=n))
+    starts = np.searchsorted(mask_boundaries, nonempty)
 
     for day in ds.time.values:
-        da = ds[var].sel(time=day)
+        # load the data once: the missing data check and the daily statistics below would otherwise
+        # each read it again from the source files
+        da = ds[var].sel(time=day).load()
 
         if _has_missing_data(da):
             continue
@@ -219,36 +354,38 @@ def aggregate(ds: xr.Dataset, var: str, masks: np.ndarray, boundaries_id: list[s
             da_min = da.values
             da_max = da.values
 
-        for i, uid in enumerate(boundaries_id):
-            v_mean = np.nanmean(da_mean[masks[i, :, :]])
-            v_min = np.nanmin(da_min[masks[i, :, :]])
-            v_max = np.nanmax(da_max[masks[i, :, :]])
-
-            rows.append(
-                {
-                    "boundary_id": uid,
-                    "date": _np_to_datetime(day).date(),
-                    "mean": v_mean,
-                    "min": v_min,
-                    "max": v_max,
-                }
+        values = da_mean.ravel()[mask_pixels]
+        valid = ~np.isnan(values)
+        sums = np.bincount(mask_boundaries, weights=np.where(valid, values, 0), minlength=n)
+        counts = np.bincount(mask_boundaries, weights=valid, minlength=n)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = sums / counts
+
+        # fmin & fmax ignore NaNs, like np.nanmin & np.nanmax
+        mins = np.full(n, np.nan)
+        maxs = np.full(n, np.nan)
+        if len(starts):
+            mins[nonempty] = np.fmin.reduceat(da_min.ravel()[mask_pixels], starts)
+            maxs[nonempty] = np.fmax.reduceat(da_max.ravel()[mask_pixels], starts)
+
+        frames.append(
+            pl.DataFrame({"boundary_id": ids, "mean": means, "min": mins, "max": maxs}).select(
+                "boundary_id",
+                pl.lit(_np_to_datetime(day).date(), dtype=pl.Date).alias("date"),
+                "mean",
+                "min",
+                "max",
             )
+        )
 
-    SCHEMA = {
-        "boundary_id": pl.String,
-        "date": pl.Date,
-        "mean": pl.Float64,
-        "min": pl.Float64,
-        "max": pl.Float64,
-    }
-
-    df = pl.DataFrame(data=rows, schema=SCHEMA)
+    df = pl.concat(frames) if frames else pl.DataFrame(schema=SCHEMA)
 
     # add week, month, and epi_week period columns
     df = df.with_columns(
-        pl.col("date").map_elements(_week, str).alias("week"),
-        pl.col("date").map_elements(_month, str).alias("month"),
-        pl.col("date").map_elements(_epi_week, str).alias("epi_week"),
+        pl.format("{}W{}", pl.col("date").dt.iso_year(), pl.col("date").dt.week()).alias("week"),
+        # month period as an integer key (yyyymm) cast to string, instead of formatting each date
+        (pl.col("date").dt.year() * 100 + pl.col("date").dt.month()).cast(pl.String).alias("month"),
+        _epi_week(pl.col("date")).alias("epi_week"),
     )
 
     return df
@@ -5,30 +5,56 @@ See <https://cds.climate.copernicus.eu/datasets/reanalysis-era5-land?tab=overvie
 
 from __future__ import annotations
 
-import importlib.resources
+import hashlib
 import json
 import logging
+import os
+import random
 import tempfile
+import threading
 import zipfile
 from calendar import monthrange
+from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
 from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from functools import cached_property
 from math import ceil
 from pathlib import Path
-from time import sleep
-from typing import Iterator
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Iterator
 
-import geopandas as gpd
-import xarray as xr
 from datapi import ApiClient, Remote
 from requests.exceptions import HTTPError
 
-with importlib.resources.open_text("openhexa.toolbox.era5", "variables.json") as f:
-    VARIABLES = json.load(f)
+from .utils import get_grib_index, get_variables
+
+# geopandas, pyarrow and xarray are slow to import and only needed by some helpers: they are
+# imported in the functions that use them so that the CDS client can be imported quickly
+if TYPE_CHECKING:
+    import xarray as xr
+
+VARIABLES = get_variables()
 
 DATASET = "reanalysis-era5-land"
 
+# zero-padded day and month strings as expected in CDS requests, indexed by their integer value
+DAYS = [f"{day:02}" for day in range(32)]
+MONTHS = [f"{month:02}" for month in range(13)]
+
+# GRIB keys required to scan available datetimes
+GRIB_READ_KEYS = ["time", "step", "paramId"]
+
+# maximum number of concurrent submissions and downloads, kept low to respect the CDS fair use
+# policy (concurrent requests per user are limited server-side anyway)
+MAX_WORKERS = 4
+
+# bounds of the delay between two polls of the CDS API (seconds): the delay starts low, doubles
+# while no request completes and is reset when one does
+MIN_POLL_INTERVAL = 5
+MAX_POLL_INTERVAL = 30
+
 log = logging.getLogger(__name__)
 
 
@@ -60,8 +86,22 @@ def bounds_from_file(fp: Path, buffer: float = 0.5) -> list[float]:
     list[float]
         Bounds (north, west, south, east).
     """
-    boundaries = gpd.read_parquet(fp)
-    xmin, ymin, xmax, ymax = boundaries.total_bounds
+    import geopandas as gpd
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+
+    fp = Path(fp)
+    fp_bbox = fp.with_suffix(".bbox.parquet")
+    if fp_bbox.exists() and fp_bbox.stat().st_mtime >= fp.stat().st_mtime:
+        # only read the bbox covering column instead of decoding all geometries
+        bbox = pq.read_table(fp_bbox, columns=["bbox"]).column("bbox").combine_chunks()
+        xmin = pc.min(bbox.field("xmin")).as_py()
+        ymin = pc.min(bbox.field("ymin")).as_py()
+        xmax = pc.max(bbox.field("xmax")).as_py()
+        ymax = pc.max(bbox.field("ymax")).as_py()
+    else:
+        boundaries = gpd.read_parquet(fp)
+        xmin, ymin, xmax, ymax = boundaries.total_bounds
     xmin = ceil(xmin - buffer)
     ymin = ceil(ymin - buffer)
     xmax = ceil(xmax + buffer)
@@ -69,6 +109,39 @@ def bounds_from_file(fp: Path, buffer: float = 0.5) -> list[float]:
     return ymax, xmin, ymin, xmax
 
 
+def ensure_bbox_column(fp: Path, row_group_size: int = 5000) -> Path:
+    """Write a copy of a GeoParquet file with a bbox covering column.
+
+    Rows are sorted along a Hilbert curve before writing so that row groups have tight bounding
+    boxes. The copy is written next to the source file with a `.bbox.parquet` suffix and is
+    used by `bounds_from_file()` when available. It can also be used to speed up spatial
+    filtering with `gpd.read_parquet(..., bbox=...)`.
+
+    Parameters
+    ----------
+    fp : Path
+        Source GeoParquet file path.
+    row_group_size : int, optional
+        Number of rows per row group (default=5000).
+
+    Returns
+    -------
+    Path
+        Path to the GeoParquet file with a bbox covering column.
+    """
+    import geopandas as gpd
+
+    fp = Path(fp)
+    dst_file = fp.with_suffix(".bbox.parquet")
+    if dst_file.exists() and dst_file.stat().st_mtime >= fp.stat().st_mtime:
+        return dst_file
+
+    boundaries = gpd.read_parquet(fp)
+    boundaries = boundaries.iloc[boundaries.geometry.hilbert_distance().argsort()]
+    boundaries.to_parquet(dst_file, write_covering_bbox=True, row_group_size=row_group_size)
+    return dst_file
+
+
 def get_period_chunk(dtimes: list[datetime]) -> dict:
     """Get the period chunk for a list of datetimes.
 
@@ -104,16 +177,12 @@ def get_period_chunk(dtimes: list[datetime]) -> dict:
 
     year = next(iter(years))
     month = next(iter(months))
-    days = []
-
-    for dtime in sorted(dtimes):
-        if dtime.day not in days:
-            days.append(dtime.day)
+    days = sorted({dtime.day for dtime in dtimes})
 
     return {
         "year": str(year),
-        "month": f"{month:02}",
-        "day": [f"{day:02}" for day in days],
+        "month": MONTHS[month],
+        "day": [DAYS[day] for day in days],
     }
 
 
@@ -136,11 +205,17 @@ def iter_chunks(dtimes: list[datetime]) -> Iterator[dict]:
     Iterator[dict]
         The period chunks (one per month max)
     """
-    for year in range(min(dtimes).year, max(dtimes).year + 1):
-        for month in range(12):
-            dtimes_month = [dtime for dtime in dtimes if dtime.year == year and dtime.month == month + 1]
-            if dtimes_month:
-                yield get_period_chunk(dtimes_month)
+    # group days per month in a single pass over the datetimes
+    days_per_month: dict[tuple[int, int], set[int]] = defaultdict(set)
+    for dtime in dtimes:
+        days_per_month[(dtime.year, dtime.month)].add(dtime.day)
+
+    for (year, month), days in sorted(days_per_month.items()):
+        yield {
+            "year": str(year),
+            "month": MONTHS[month],
+            "day": [DAYS[day] for day in sorted(days)],
+        }
 
 
 def list_datetimes_in_dataset(ds: xr.Dataset) -> list[datetime]:
@@ -150,39 +225,118 @@ def list_datetimes_in_dataset(ds: xr.Dataset) -> list[datetime]:
     dimensions. We consider that a datetime is available in a dataset if non-null data values are
     present for more than 1 step.
     """
-    dtimes = []
+    dtimes: set[datetime] = set()
     data_vars = list(ds.data_vars)
-    var = data_vars[0]
-
-    for time in ds.time.values:
-        dtime = datetime.fromtimestamp(time.astype(int) / 1e9, tz=timezone.utc)
-        if dtime in dtimes:
-            continue
-        non_null = ds.sel(time=time)[var].notnull().sum().values.item()
-        non_null /= len(ds.latitude) * len(ds.longitude)
-        n_steps = len(ds.step) if ds.step.ndim else 1
-        if non_null >= n_steps:
-            dtimes.append(dtime)
+    da = ds[data_vars[0]]
 
-    return dtimes
+    # count non-null values for all times at once, so that data is read from the file in a
+    # single pass instead of once per time
+    non_null = da.notnull().sum(dim=[dim for dim in da.dims if dim != "time"]).values
+    non_null = non_null / (len(ds.latitude) * len(ds.longitude))
+    n_steps = len(ds.step) if ds.step.ndim else 1
 
+    for time, count in zip(ds.time.values, non_null):
+        if count >= n_steps:
+            dtimes.add(datetime.fromtimestamp(time.astype(int) / 1e9, tz=timezone.utc))
 
-def list_datetimes_in_dir(data_dir: Path) -> list[datetime]:
-    """List datetimes in datasets that can be found in an input directory."""
-    dtimes = []
+    return sorted(dtimes)
 
-    for f in data_dir.glob("*.grib"):
-        # sometimes gribs are actually zip files
-        with tempfile.NamedTemporaryFile(mode="wb") as tmp:
-            if zipfile.is_zipfile(f):
-                with zipfile.ZipFile(f, "r") as zip:
-                    tmp.write(zip.read("data.grib"))
-                ds = xr.open_dataset(tmp.name, engine="cfgrib")
 
-            else:
-                ds = xr.open_dataset(f, engine="cfgrib")
+def list_datetimes_in_file(fp: Path) -> list[datetime]:
+    """List datetimes in a GRIB file for which data is available."""
+    import xarray as xr
+
+    # sometimes gribs are actually zip files
+    with tempfile.NamedTemporaryFile(mode="wb") as tmp:
+        if zipfile.is_zipfile(fp):
+            with zipfile.ZipFile(fp, "r") as zip:
+                tmp.write(zip.read("data.grib"))
+            # no need to persist the index of a temporary file
+            backend_kwargs = {"indexpath": "", "read_keys": GRIB_READ_KEYS}
+            with xr.open_dataset(tmp.name, engine="cfgrib", backend_kwargs=backend_kwargs) as ds:
+                return list_datetimes_in_dataset(ds)
+
+        else:
+            backend_kwargs = {"indexpath": get_grib_index(fp).as_posix(), "read_keys": GRIB_READ_KEYS}
+            with xr.open_dataset(fp, engine="cfgrib", backend_kwargs=backend_kwargs) as ds:
+                return list_datetimes_in_dataset(ds)
+
+
+def _read_json(fp: Path) -> dict:
+    """Read a JSON object from a file, or return an empty dict if it is missing or unreadable."""
+    try:
+        with open(fp) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _write_json(fp: Path, data: dict) -> None:
+    """Write a JSON object to a file atomically.
+
+    The data is written to a temporary file in the same directory which then replaces the
+    destination file, so that an interrupted write never leaves a truncated file behind.
+    """
+    with tempfile.NamedTemporaryFile(mode="w", dir=fp.parent, prefix=f".{fp.name}.", delete=False) as tmp:
+        try:
+            json.dump(data, tmp)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    os.replace(tmp.name, fp)
 
-            dtimes += list_datetimes_in_dataset(ds)
+
+def list_datetimes_in_dir(
+    data_dir: Path, manifest_path: Path | None = None, max_workers: int | None = None
+) -> list[datetime]:
+    """List datetimes in datasets that can be found in an input directory.
+
+    Parameters
+    ----------
+    data_dir : Path
+        Directory containing the GRIB files.
+    manifest_path : Path | None, optional
+        JSON file where datetimes found in each file are recorded along with the file modification
+        time. Files that have not been modified since the last scan are not opened again. Defaults
+        to None (no manifest).
+    max_workers : int | None, optional
+        Maximum number of GRIB files decoded concurrently. Defaults to half the number of CPUs.
+
+    Returns
+    -------
+    list[datetime]
+        Sorted list of available datetimes.
+    """
+    dtimes = []
+    if not max_workers:
+        max_workers = max(1, (os.cpu_count() or 1) // 2)
+
+    # an unreadable manifest is treated as empty: all files are scanned again
+    manifest = _read_json(manifest_path) if manifest_path else {}
+
+    scanned = {}
+    to_scan: list[tuple[Path, int]] = []
+    for fp in data_dir.glob("*.grib"):
+        mtime = fp.stat().st_mtime_ns
+        entry = manifest.get(fp.name)
+        if entry and entry["mtime"] == mtime:
+            scanned[fp.name] = entry
+            dtimes += [datetime.fromisoformat(dtime) for dtime in entry["dates"]]
+        else:
+            to_scan.append((fp, mtime))
+
+    # decoding GRIB files is independent from one file to another and mostly happens outside of
+    # the GIL, so new or modified files are scanned concurrently
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        files_dtimes = executor.map(list_datetimes_in_file, [fp for fp, _ in to_scan])
+        for (fp, mtime), file_dtimes in zip(to_scan, files_dtimes):
+            scanned[fp.name] = {"mtime": mtime, "dates": [dtime.isoformat() for dtime in file_dtimes]}
+            dtimes += file_dtimes
+
+    if manifest_path:
+        _write_json(manifest_path, scanned)
 
     dtimes = sorted(set(dtimes))
 
@@ -194,12 +348,16 @@ def list_datetimes_in_dir(data_dir: Path) -> list[datetime]:
 
 def date_range(start: datetime, end: datetime) -> list[datetime]:
     """Get a range of dates with a 1-day step."""
-    drange = []
-    dt = start
-    while dt <= end:
-        drange.append(dt)
-        dt += timedelta(days=1)
-    return drange
+    if end < start:
+        return []
+    step = timedelta(days=1)
+    return [start + i * step for i in range((end - start) // step + 1)]
+
+
+def request_key(request: DataRequest) -> str:
+    """Get a deterministic key for a data request payload."""
+    payload = json.dumps(request.__dict__, sort_keys=True)
+    return hashlib.blake2b(payload.encode()).hexdigest()
 
 
 def build_request(
@@ -289,6 +447,28 @@ def build_request(
     )
 
 
+class RateLimiter:
+    """Space out calls to an API so that they do not exceed a given rate.
+
+    The limiter is thread-safe: calls to `wait()` from multiple threads are scheduled one after
+    the other.
+    """
+
+    def __init__(self, calls_per_minute: int) -> None:
+        self.interval = 60 / calls_per_minute
+        self._next_call = monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        """Block until the next call is allowed."""
+        with self._lock:
+            now = monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            sleep(delay)
+
+
 class CDS:
     """Climate data store API client based on datapi."""
 
@@ -306,18 +486,23 @@ class CDS:
         return collection.end_datetime
 
     def get_remote_requests(self) -> list[dict]:
-        """Fetch list of the last 100 data requests in the CDS account."""
-        requests = []
-        jobs = self.client.get_jobs(limit=100)
-        for request_id in jobs.request_uids:
+        """Fetch list of the last 100 data requests in the CDS account.
+
+        Failed, dismissed and deleted jobs are filtered out server-side so that we don't have to
+        fetch them one by one. Details of the remaining jobs are fetched concurrently.
+        """
+        jobs = self.client.get_jobs(limit=100, status=["accepted", "running", "successful"])
+
+        def get_request(request_id: str) -> dict | None:
             try:
                 remote = self.client.get_remote(request_id)
-                if remote.status in ["failed", "dismissed", "deleted"]:
-                    continue
-                requests.append({"request_id": request_id, "request": remote.request})
+                return {"request_id": request_id, "request": remote.request}
             except HTTPError:
-                continue
-        return requests
+                return None
+
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+            requests = executor.map(get_request, jobs.request_uids)
+            return [request for request in requests if request]
 
     def get_remote_from_request(self, request: DataRequest, existing_requests: list[dict]) -> Remote | None:
         """Look for a remote object that matches the provided request payload.
@@ -365,11 +550,15 @@ class CDS:
         area: list[float],
         dst_dir: str | Path,
         time: list[int] | None = None,
+        concurrency: int = MAX_WORKERS,
+        submissions_per_minute: int | None = None,
+        wait: int = MAX_POLL_INTERVAL,
     ) -> None:
         """Download all ERA5 data files needed to cover the period.
 
         Data requests are sent asynchronously (max one per month) to the CDS API and fetched when
-        they are completed.
+        they are completed. Only dates that are missing in the output directory are requested, and
+        pending requests are recorded in `.inflight.json` so that an interrupted run can resume them.
 
         Parameters
         ----------
@@ -385,6 +574,15 @@ class CDS:
             Output directory.
         time : list[int] | None, optional
             Hours of interest (ex: [1, 6, 18]). Defaults to None (all hours).
+        concurrency : int, optional
+            Maximum number of concurrent submissions and downloads. Defaults to `MAX_WORKERS` (4)
+            to respect the CDS fair use policy.
+        submissions_per_minute : int | None, optional
+            Maximum number of data requests submitted per minute. Defaults to None (no limit).
+        wait : int, optional
+            Maximum delay between two polls of the CDS API, in seconds. Polling starts every 5
+            seconds and backs off exponentially up to this value while no request completes.
+            Defaults to 30.
         """
         dst_dir = Path(dst_dir)
         dst_dir.mkdir(parents=True, exist_ok=True)
@@ -402,42 +600,129 @@ class CDS:
         # get the list of dates for which we will want to download data, which is the difference
         # between the available (already downloaded) and the requested dates
         drange = date_range(start, end)
-        available = [dtime.date() for dtime in list_datetimes_in_dir(dst_dir)]
+        available = {
+            dtime.date() for dtime in list_datetimes_in_dir(dst_dir, manifest_path=Path(dst_dir, ".manifest.json"))
+        }
         dates = [d for d in drange if d.date() not in available]
         msg = f"Will request data for {len(dates)} dates"
         log.info(msg)
 
         existing_requests = self.get_remote_requests()
         remotes: list[Remote] = []
+        keys: dict[str, str] = {}
+
+        # data requests submitted by a previous run that were not downloaded yet, so that they can
+        # be resumed instead of being submitted (and queued) again
+        # (an unreadable file is treated as empty, requests are then submitted again)
+        inflight_path = Path(dst_dir, ".inflight.json")
+        inflight: dict[str, str] = _read_json(inflight_path)
+
+        def save_inflight() -> None:
+            _write_json(inflight_path, inflight)
+
+        new_requests: dict[str, DataRequest] = {}
 
         for chunk in iter_chunks(dates):
             request = build_request(variable=variable, data_format="grib", area=area, time=time, **chunk)
+            key = request_key(request)
+
+            # has the exact same request been submitted by a previous run? if yes, resume it
+            # unless it has failed, been dismissed or deleted in the meantime
+            if key in inflight:
+                try:
+                    remote = self.client.get_remote(inflight[key])
+                    status = remote.status
+                except HTTPError:
+                    status = None
+                if status in ("accepted", "running", "successful"):
+                    remotes.append(remote)
+                    keys[remote.request_uid] = key
+                    msg = f"Resumed data request {remote.request_uid} for {request.year}-{request.month}"
+                    log.info(msg)
+                    continue
+                msg = f"Data request {inflight.pop(key)} cannot be resumed ({status}), it will be submitted again"
+                log.warning(msg)
 
             # has a similar request been submitted recently? if yes, use it instead of submitting
             # a new one
             remote = self.get_remote_from_request(request, existing_requests)
             if remote:
                 remotes.append(remote)
+                keys[remote.request_uid] = key
                 msg = f"Found existing request for date {request.year}-{request.month}"
                 log.info(msg)
             else:
-                remote = self.submit(request)
+                # identical requests are only submitted once
+                new_requests[key] = request
+
+        # submissions are independent network round-trips, send them concurrently
+        limiter = RateLimiter(submissions_per_minute) if submissions_per_minute else None
+
+        def submit(request: DataRequest) -> Remote:
+            if limiter:
+                limiter.wait()
+            return self.submit(request)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for (key, request), remote in zip(new_requests.items(), executor.map(submit, new_requests.values())):
                 remotes.append(remote)
+                keys[remote.request_uid] = key
                 msg = f"Submitted new data request {remote.request_uid} for {request.year}-{request.month}"
+                log.info(msg)
+
+        # only keep track of the requests of the current run
+        inflight.clear()
+        for remote in remotes:
+            inflight[keys[remote.request_uid]] = remote.request_uid
+        save_inflight()
+
+        # poll the API for completed requests and download their results in a thread pool, so
+        # that downloads run while we keep waiting for the remaining requests
+        poll_interval = min(MIN_POLL_INTERVAL, wait)
+        next_poll = monotonic()
+        downloads: dict[Future, Remote] = {}
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            while remotes or downloads:
+                if remotes and monotonic() >= next_poll:
+                    ready = [remote for remote in remotes if remote.results_ready]
+                    for remote in ready:
+                        remotes.remove(remote)
+                        downloads[executor.submit(self._download_remote, remote, dst_dir)] = remote
+
+                    # poll again soon after progress, back off while requests are still queued
+                    if ready:
+                        poll_interval = min(MIN_POLL_INTERVAL, wait)
+                    else:
+                        poll_interval = min(poll_interval * 2, wait)
+
+                    # add some jitter so that concurrent clients do not poll in lockstep
+                    delay = poll_interval + random.uniform(0, poll_interval * 0.1)
+                    next_poll = monotonic() + delay
+                    if remotes:
+                        msg = f"Still {len(remotes)} files to download. Waiting {delay:.0f}s before retrying..."
+                        log.info(msg)
+
+                timeout = max(0, next_poll - monotonic()) if remotes else None
+                if not downloads:
+                    sleep(timeout)
+                    continue
 
-        while remotes:
-            for remote in remotes:
-                if remote.results_ready:
-                    request = remote.request
-                    fname = f"{request['year']}{request['month']}_{remote.request_uid}.grib"
-                    dst_file = Path(dst_dir, fname)
-                    remote.download(dst_file.as_posix())
+                done, _ = wait_futures(downloads, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    remote = downloads.pop(future)
+                    dst_file = future.result()
+                    inflight.pop(keys[remote.request_uid], None)
+                    save_inflight()
                     msg = f"Downloaded {dst_file.name}"
                     log.info(msg)
-                    remotes.remove(remote)
                     remote.delete()
 
-            if remotes:
-                msg = f"Still {len(remotes)} files to download. Waiting 30s before retrying..."
-                log.info(msg)
-                sleep(30)
+    @staticmethod
+    def _download_remote(remote: Remote, dst_dir: Path) -> Path:
+        """Download the results of a completed data request into the output directory."""
+        request = remote.request
+        fname = f"{request['year']}{request['month']}_{remote.request_uid}.grib"
+        dst_file = Path(dst_dir, fname)
+        remote.download(dst_file.as_posix())
+        return dst_file
@@ -6,20 +6,24 @@ Products are provided as raw NetCDF files and are usually available with a ~3 mo
 
 from __future__ import annotations
 
-import importlib.resources
-import json
 import logging
+import os
 import shutil
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from functools import cached_property
 from pathlib import Path
 
 import requests
 from google.cloud import storage
+from requests.adapters import HTTPAdapter
 
-with importlib.resources.open_text("openhexa.toolbox.era5", "variables.json") as f:
-    VARIABLES = json.load(f)
+from .utils import get_variables
+
+VARIABLES = get_variables()
+
+# maximum number of concurrent product downloads (also the size of the HTTP connection pool)
+MAX_WORKERS = 8
 
 log = logging.getLogger(__name__)
 
@@ -37,6 +41,12 @@ class Client:
         self.client = storage.Client.create_anonymous_client()
         self.bucket = self.client.bucket("gcp-public-data-arco-era5")
 
+        # reuse connections across product downloads instead of opening a new one for each file
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
     @staticmethod
     def prefix(variable: str, date: datetime) -> str:
         """Build key prefix for a given product."""
@@ -63,16 +73,6 @@ class Client:
         day = int(subdir[-2])
         return datetime(year, month, day)
 
-    def find(self, variable: str, date: datetime) -> str | None:
-        """Find public URL of product. Return None if not found."""
-        prefix = self.prefix(variable, date)
-        blobs = self.client.list_blobs(self.bucket, prefix=prefix, max_results=1)
-        blobs = list(blobs)
-        if blobs:
-            return blobs[0].public_url
-        else:
-            return None
-
     def download(self, variable: str, date: datetime, dst_file: str | Path, overwrite=False):
         """Download an Era5 NetCDF product for a given day.
 
@@ -104,26 +104,41 @@ class Client:
         if variable not in VARIABLES:
             raise ParameterError("%s is not a valid climate data store variable name", variable)
 
-        url = self.find(variable, date)
-        if not url:
-            raise NotFoundError("%s product not found for date %s", variable, date.strftime("%Y-%m-%d"))
-
-        with tempfile.NamedTemporaryFile() as tmp:
-            with open(tmp.name, "wb") as f:
-                with requests.get(url, stream=True) as r:
-                    for chunk in r.iter_content(chunk_size=1024**2):
-                        if chunk:
-                            f.write(chunk)
-
-            shutil.copy(tmp.name, dst_file)
+        # the public URL of a product can be built from its key, a missing product is detected
+        # from the download response instead of listing the bucket beforehand
+        url = self.bucket.blob(self.prefix(variable, date)).public_url
+
+        # download to a sibling .part file and rename it once complete, so that an interrupted
+        # download never leaves a truncated product at the destination path
+        part = dst_file.with_suffix(dst_file.suffix + ".part")
+        try:
+            with open(part, "wb") as f:
+                with self.session.get(url, stream=True, timeout=(10, 300)) as r:
+                    if r.status_code == 404:
+                        raise NotFoundError("%s product not found for date %s", variable, date.strftime("%Y-%m-%d"))
+                    r.raise_for_status()
+                    # copy the raw stream in large blocks rather than iterating over chunks in python
+                    r.raw.decode_content = True
+                    shutil.copyfileobj(r.raw, f, 4 * 1024**2)
+            os.replace(part, dst_file)
+        finally:
+            part.unlink(missing_ok=True)
 
         log.debug("Downloaded %s", str(dst_file.absolute()))
 
-    def sync(self, variable: str, start_date: datetime, end_date: datetime, dst_dir: str | Path):
+    def sync(
+        self,
+        variable: str,
+        start_date: datetime,
+        end_date: datetime,
+        dst_dir: str | Path,
+        max_workers: int = MAX_WORKERS,
+    ):
         """Download all products for a given variable and date range.
 
         If products are already present in the destination directory, they will be skipped.
-        Expects file names to be formatted as "YYYY-MM-DD_VARIABLE.nc".
+        Expects file names to be formatted as "YYYY-MM-DD_VARIABLE.nc". Missing products are
+        downloaded concurrently.
 
         Parameters
         ----------
@@ -135,6 +150,8 @@ class Client:
             End date (year, month, day).
         dst_dir : str | Path
             Output directory.
+        max_workers : int, optional
+            Maximum number of concurrent downloads (default=8).
         """
         dst_dir = Path(dst_dir)
         dst_dir.mkdir(parents=True, exist_ok=True)
@@ -147,12 +164,25 @@ class Client:
             log.info("Setting `end_date` to the latest available date: %s" % date.strftime("%Y-%m-%d"))
             end_date = self.latest
 
-        while date <= end_date:
+        # enumerate the expected products up-front and check them against a single listing of the
+        # output directory rather than two stat calls per day
+        existing = set(os.listdir(dst_dir))
+        ndays = (end_date - date).days + 1
+        dates = [date + timedelta(days=i) for i in range(ndays)]
+
+        to_download: list[tuple[datetime, Path]] = []
+        for date in dates:
             expected_filename = f"{date.strftime('%Y-%m-%d')}_{variable}.nc"
-            fpath = Path(dst_dir, expected_filename)
-            fpath_grib = Path(dst_dir, expected_filename.replace(".nc", ".grib"))
-            if fpath.exists() or fpath_grib.exists():
+            if expected_filename in existing or expected_filename.replace(".nc", ".grib") in existing:
                 log.debug("%s already exists, skipping download" % expected_filename)
             else:
-                self.download(variable=variable, date=date, dst_file=fpath, overwrite=False)
-            date += timedelta(days=1)
+                to_download.append((date, Path(dst_dir, expected_filename)))
+
+        # downloads are network-bound and independent from each other
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.download, variable=variable, date=date, dst_file=fpath, overwrite=False)
+                for date, fpath in to_download
+            ]
+            for future in futures:
+                future.result()
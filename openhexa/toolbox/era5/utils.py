@@ -0,0 +1,32 @@
+"""Utility functions shared by the ERA5 modules."""
+
+from __future__ import annotations
+
+import importlib.resources
+import json
+from functools import lru_cache
+from pathlib import Path
+
+
+@lru_cache(maxsize=1)
+def get_variables() -> dict:
+    """Get the supported ERA5-Land variables and their metadata.
+
+    The variables are loaded from the `variables.json` file shipped with the package and parsed
+    only once per process. The returned dictionary is shared between callers and must not be
+    modified.
+    """
+    with importlib.resources.open_text("openhexa.toolbox.era5", "variables.json") as f:
+        return json.load(f)
+
+
+def get_grib_index(fp: Path) -> Path:
+    """Get path to the persistent cfgrib index of a GRIB file.
+
+    The index is stored next to the GRIB file so that it is only built once. It is removed if it
+    is older than the GRIB file, in which case cfgrib will build it again.
+    """
+    idx = Path(f"{fp.as_posix()}.idx")
+    if idx.exists() and idx.stat().st_mtime < fp.stat().st_mtime:
+        idx.unlink()
+    return idx
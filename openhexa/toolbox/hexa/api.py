@@ -1,6 +1,20 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from diskcache import Cache
+from pathlib import Path
 from requests import Session
+from requests.adapters import HTTPAdapter
+from threading import Lock
+from time import monotonic
+import hashlib
+import json
+import re
 import typing
 
+# maximum number of query results kept in memory when caching is enabled
+CACHE_MAXSIZE = 128
+
 
 class NotFound(Exception):
     """Errors related to an element not found."""
@@ -9,9 +23,23 @@ class NotFound(Exception):
 
 
 class OpenHEXAClient:
-    def __init__(self, base_url):
+    def __init__(self, base_url, cache_ttl: float = 0, cache_dir: typing.Optional[typing.Union[str, Path]] = None):
+        """
+        base_url: OpenHEXA server URL
+        cache_ttl: time (in seconds) during which the results of identical queries are reused (0 = no cache)
+        cache_dir: directory where cached results are persisted across sessions (default: in memory only)
+        """
         self.url = base_url.rstrip("/")
+        self.cache_ttl = cache_ttl
+        # results are stored as JSON and decoded on each hit, so that callers never share (and mutate) them
+        self._cache: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._cache_lock = Lock()
+        self._disk_cache = Cache(Path(cache_dir)) if cache_dir else None
         self.session = Session()
+        # keep enough pooled keep-alive connections to the server for concurrent queries
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
         self.session.headers.update({"Content-Type": "application/json", "User-Agent": "OpenHEXA Python Client"})
 
     def authenticate(
@@ -60,6 +88,21 @@ class OpenHEXAClient:
         return self.session.post(f"{self.url}/graphql", json={"query": operation, "variables": variables})
 
     def query(self, operation, variables=None):
+        # results of queries (not mutations) are reused for `cache_ttl` seconds
+        key = None
+        if self.cache_ttl and not re.match(r"\s*mutation\b", operation):
+            key = self._cache_key(operation, variables)
+            if self._disk_cache is not None:
+                cached = self._disk_cache.get(key)
+                if cached is not None:
+                    return cached
+            else:
+                with self._cache_lock:
+                    cached = self._cache.get(key)
+                    if cached and monotonic() - cached[0] < self.cache_ttl:
+                        self._cache.move_to_end(key)
+                        return json.loads(cached[1])
+
         resp = self._graphql_request(operation, variables)
         if resp.status_code == 400:
             raise Exception(resp.json()["errors"][0]["message"])
@@ -67,4 +110,161 @@ class OpenHEXAClient:
         payload = resp.json()
         if payload.get("errors"):
             raise Exception(payload["errors"])
+
+        if key and self._disk_cache is not None:
+            self._disk_cache.set(key, payload["data"], expire=self.cache_ttl, retry=True)
+        elif key:
+            self._cache_set(key, json.dumps(payload["data"]))
         return payload["data"]
+
+    def _cache_set(self, key: str, value: str):
+        """Cache a query result, evicting expired results and then the least recently used ones."""
+        now = monotonic()
+        with self._cache_lock:
+            self._cache[key] = (now, value)
+            self._cache.move_to_end(key)
+            for expired in [k for k, (cached_at, _) in self._cache.items() if now - cached_at >= self.cache_ttl]:
+                del self._cache[expired]
+            while len(self._cache) > CACHE_MAXSIZE:
+                self._cache.popitem(last=False)
+
+    def _cache_key(self, operation, variables) -> str:
+        """
+        Build the cache key of a query.
+
+        The server URL and the credentials are part of the key, so that results persisted on disk are never
+        returned to another user or for another server.
+        """
+        identity = [self.url, self.session.headers.get("Authorization"), self.session.headers.get("Cookie")]
+        key = json.dumps([identity, operation, variables], sort_keys=True, default=str)
+        return hashlib.sha256(key.encode()).hexdigest()
+
+    def clear_cache(self):
+        """Forget the results of all cached queries."""
+        with self._cache_lock:
+            self._cache.clear()
+        if self._disk_cache is not None:
+            self._disk_cache.clear()
+
+    def batch_query(self, operations: list[tuple[str, typing.Optional[dict]]]) -> list[dict]:
+        """
+        Run several independent GraphQL queries in a single request.
+
+        Top-level fields of each query are aliased and its variables renamed, so that all queries can be
+        merged into a single document. The response is then split back into one result per query. If a
+        query cannot be merged (mutations, subscriptions, fragments), queries are sent one by one instead.
+
+        operations: list of (operation, variables) tuples
+        """
+        merged = []
+        for i, (operation, _) in enumerate(operations):
+            parsed = _prefix_query(operation, f"q{i}_")
+            if parsed is None:
+                return [self.query(operation, variables) for operation, variables in operations]
+            merged.append(parsed)
+
+        definitions = [definition for definition, _ in merged if definition]
+        header = f"query Batch({', '.join(definitions)})" if definitions else "query Batch"
+        document = header + " {\n" + "\n".join(selection for _, selection in merged) + "\n}"
+        variables = {}
+        for i, (_, op_variables) in enumerate(operations):
+            variables.update({f"q{i}_{name}": value for name, value in (op_variables or {}).items()})
+
+        data = self.query(document, variables)
+        results = []
+        for i in range(len(operations)):
+            prefix = f"q{i}_"
+            results.append({key[len(prefix) :]: value for key, value in data.items() if key.startswith(prefix)})
+        return results
+
+
+# GraphQL lexical tokens: strings and comments are matched first so that their content is never parsed
+_TOKENS = re.compile(
+    r'(?P<string>"""(?:\\"""|(?!""").)*"""|"(?:\\.|[^"\\\n])*")'
+    r"|(?P<comment>#[^\n\r]*)"
+    r"|(?P<variable>\$\w+)"
+    r"|(?P<number>-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[_A-Za-z]\w*)"
+    r"|(?P<spread>\.\.\.)"
+    r"|(?P<punctuator>.)",
+    re.S,
+)
+
+
+def _prefix_query(operation: str, prefix: str) -> typing.Optional[tuple[str, str]]:
+    """
+    Prefix the variables and the top-level fields of a GraphQL query.
+
+    Return a tuple with the variable definitions and the selection set (without its enclosing braces), or None
+    if the operation is not a single query that can be merged with others.
+    """
+    # comments are dropped, the line break that ends them is kept
+    tokens = [(m.lastgroup, m.group()) for m in _TOKENS.finditer(operation) if m.lastgroup != "comment"]
+
+    definitions, selection = [], []
+    part = "header"
+    depth = 0
+    after_alias = after_directive = False
+    for i, (kind, value) in enumerate(tokens):
+        if value.isspace() or value == ",":
+            if part == "definitions":
+                definitions.append(value)
+            elif part == "selection":
+                selection.append(value)
+            continue
+        if value == '"':
+            # unterminated string
+            return None
+
+        if part == "header":
+            if kind == "name" and value in ("mutation", "subscription", "fragment"):
+                return None
+            if value == "(" and not definitions:
+                part = "definitions"
+            elif value == "{":
+                part = "selection"
+            elif kind != "name":
+                return None
+        elif part == "end":
+            # another operation or a fragment definition
+            return None
+
+        if kind == "punctuator" and value in "([{":
+            depth += 1
+        elif kind == "punctuator" and value in ")]}":
+            depth -= 1
+        if kind == "variable":
+            value = f"${prefix}{value[1:]}"
+
+        if part == "definitions":
+            definitions.append(value)
+            if depth == 0:
+                part = "header"
+            continue
+        if part == "selection" and depth == 0:
+            part = "end"
+            continue
+        if part != "selection" or (depth == 1 and value == "{"):
+            continue
+
+        # alias top-level fields, i.e. names found outside of any argument list or selection set
+        if depth == 1 and kind == "spread":
+            # inline fragment or fragment spread at the top level
+            return None
+        if depth == 1 and value == "@":
+            after_directive = True
+        elif depth == 1 and kind == "name":
+            if after_directive:
+                after_directive = False
+            elif after_alias:
+                after_alias = False
+            elif next((v for _, v in tokens[i + 1 :] if not v.isspace() and v != ","), None) == ":":
+                value = prefix + value
+                after_alias = True
+            else:
+                value = f"{prefix}{value}: {value}"
+        selection.append(value)
+
+    if part != "end":
+        return None
+    return "".join(definitions)[1:-1].strip(), "".join(selection)
@@ -1,4 +1,7 @@
+from __future__ import annotations
+
 from .api import OpenHEXAClient, NotFound
+from concurrent.futures import ThreadPoolExecutor
 import typing
 import uuid
 
@@ -10,6 +13,8 @@ class OpenHEXA:
         username: typing.Optional[str] = None,
         password: typing.Optional[str] = None,
         token: typing.Optional[str] = None,
+        cache_ttl: float = 0,
+        cache_dir: typing.Optional[str] = None,
     ):
         """
         Initializes the OpenHEXA client. If username and password are provided we will try to
@@ -22,6 +27,10 @@ class OpenHEXA:
         username: OpenHEXA instance username
         password: OpenHEXA instance password
         token: OpenHEXA pipeline token
+        cache_ttl: time (in seconds) during which the results of identical queries are reused, mutations are
+            never cached (default: 0, no cache)
+        cache_dir: directory where cached query results are persisted, so that they can be reused across
+            sessions for `cache_ttl` seconds (default: None, results are only cached in memory)
 
         Raises
         ------
@@ -40,7 +49,7 @@ class OpenHEXA:
             >>> hexa = OpenHEXA(server_url="https://app.demo.openhexa.org",token="token")
         """
 
-        self.client = OpenHEXAClient(server_url)
+        self.client = OpenHEXAClient(server_url, cache_ttl=cache_ttl, cache_dir=cache_dir)
         if username and password:
             self.client.authenticate(with_credentials=(username, password))
         elif token:
@@ -93,6 +102,37 @@ class OpenHEXA:
         """
         return self.client.query(operation, variables)
 
+    def batch_query(self, operations: list[tuple[str, typing.Optional[dict]]]) -> list[dict]:
+        """
+        Executes several independent queries in a single request.
+
+        Queries are merged into a single GraphQL document, in which the top-level fields of each query are
+        aliased and its variables renamed. The response is then split back into one result per query. Mutations
+        cannot be merged: if any operation is not a plain query, operations are sent one by one instead.
+
+        Parameters:
+        ----------
+        operations : list[tuple[str, dict | None]]
+            A list of (operation, variables) tuples.
+
+        Returns:
+        -------
+        list[dict]
+            The result of each query, in the same order as the operations.
+
+        Example Usage:
+        --------------
+        ```
+        workspace, pipelines = hexa.batch_query(
+            [
+                ("query($slug: String!) { workspace(slug: $slug) { name } }", {"slug": "my-workspace"}),
+                ("query($slug: String!) { pipelines(workspaceSlug: $slug) { totalItems } }", {"slug": "my-workspace"}),
+            ]
+        )
+        ```
+        """
+        return self.client.batch_query(operations)
+
     def get_workspaces(self, page: int = 1, per_page: int = 10) -> dict:
         """
         Fetches a paginated list of workspaces.
@@ -164,6 +204,65 @@ class OpenHEXA:
             {"workspaceSlug": workspace_slug, "page": page, "perPage": per_page},
         )
 
+    def iter_workspaces(self, per_page: int = 50, max_workers: int = 8) -> typing.Iterator[dict]:
+        """
+        Iterates over all workspaces.
+
+        The first page is fetched to get the total number of pages, the remaining pages are then fetched
+        concurrently. Workspaces are yielded in the same order as the pages.
+
+        Parameters:
+        ----------
+        per_page : int, optional
+            The number of items to retrieve per page. Defaults to 50.
+        max_workers : int, optional
+            The maximum number of pages fetched concurrently. Defaults to 8.
+
+        Returns:
+        -------
+        Iterator[dict]
+            The workspaces (`slug` and `name`).
+        """
+        yield from self._iter_pages(
+            lambda page: self.get_workspaces(page=page, per_page=per_page)["workspaces"], max_workers
+        )
+
+    def iter_pipelines(self, workspace_slug: str, per_page: int = 50, max_workers: int = 8) -> typing.Iterator[dict]:
+        """
+        Iterates over all pipelines within a specified workspace.
+
+        The first page is fetched to get the total number of pages, the remaining pages are then fetched
+        concurrently. Pipelines are yielded in the same order as the pages.
+
+        Parameters:
+        ----------
+        workspace_slug : str
+            The slug identifier of the workspace to retrieve pipelines from.
+        per_page : int, optional
+            The number of items to retrieve per page. Defaults to 50.
+        max_workers : int, optional
+            The maximum number of pages fetched concurrently. Defaults to 8.
+
+        Returns:
+        -------
+        Iterator[dict]
+            The pipelines (`id`, `name`, `code` and `type`).
+        """
+        yield from self._iter_pages(
+            lambda page: self.get_pipelines(workspace_slug, page=page, per_page=per_page)["pipelines"], max_workers
+        )
+
+    @staticmethod
+    def _iter_pages(get_page: typing.Callable[[int], dict], max_workers: int) -> typing.Iterator[dict]:
+        """Iterates over the items of all pages, fetching pages after the first one concurrently."""
+        first = get_page(1)
+        yield from first["items"]
+        if first["totalPages"] <= 1:
+            return
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page in executor.map(get_page, range(2, first["totalPages"] + 1)):
+                yield from page["items"]
+
     def get_pipeline(self, workspace_slug: str, code: str) -> dict:
         """
         Retrieves details of a specific pipeline by its code within a given workspace.
@@ -1,9 +1,15 @@
+import base64
+import copy
+import json
 import logging
-from datetime import datetime, timezone
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from threading import Lock
+from time import monotonic
 from typing import Union
 
 import requests
-import jwt
 from requests.adapters import HTTPAdapter
 from urllib3 import Retry
 
@@ -25,19 +31,28 @@ class IASOError(Exception):
         logging.error(f"IASO Error : {self.message}")
 
 
+# refresh the access token this long before it expires, rather than waiting for a 401 response
+TOKEN_EXPIRY_MARGIN = timedelta(seconds=30)
+
+# maximum number of responses kept in memory when caching is enabled
+CACHE_MAXSIZE = 128
+
+
 class ApiClient(requests.Session):
     """
     Client to manage HTTP session with IASO API on behalf of OpenHexa toolbox
 
     """
 
-    def __init__(self, server_url: str, username: str, password: str):
+    def __init__(self, server_url: str, username: str, password: str, cache_ttl: float = 0):
         """
         Initialize the IASO API client.
 
         :param server_url: IASO server URL
         :param username: IASO instance username
         :param password: IASO instance password
+        :param cache_ttl: time (in seconds) during which responses to identical GET requests are reused
+            (default: 0, no cache)
 
         Examples:
             >>> client = ApiClient(server_url="http://localhost:8080", username="admin", password="<PASSWORD>")
@@ -54,6 +69,26 @@ class ApiClient(requests.Session):
         self.token = None
         self.token_expiry = None
         self._refresh_token = None
+        self.cache_ttl = cache_ttl
+        self._cache: OrderedDict[str, tuple[float, requests.Response]] = OrderedDict()
+        self._cache_lock = Lock()
+
+        # mount the adapter before authenticating, so that the token request goes through the same
+        # connection pool (and keep-alive connection) as the following requests
+        # a single host is reached, but allow enough pooled keep-alive connections for concurrent requests
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=5,
+                allowed_methods=["HEAD", "GET"],
+                status_forcelist=[429, 500, 502, 503, 504],
+            ),
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
         self.authenticate()
 
     def request(self, method: str, url: str, *args, **kwargs) -> requests.Response:
@@ -61,9 +96,31 @@ class ApiClient(requests.Session):
         Sends HTTP request to IASO API, handles exceptions raised during request
         """
         full_url = f"{self.server_url}/{url.strip('/')}/"
+
+        if (
+            self.token_expiry
+            and self._refresh_token
+            and url.strip("/") not in ("api/token", "api/token/refresh")
+            and datetime.now(timezone.utc) + TOKEN_EXPIRY_MARGIN >= self.token_expiry
+        ):
+            self.refresh_session()
+
+        # responses to GET requests are reused for `cache_ttl` seconds
+        key = None
+        if self.cache_ttl and method.upper() == "GET" and not args:
+            key = json.dumps([full_url, kwargs.get("params")], sort_keys=True, default=str)
+            with self._cache_lock:
+                cached = self._cache.get(key)
+                if cached and monotonic() - cached[0] < self.cache_ttl:
+                    self._cache.move_to_end(key)
+                    # each caller gets its own copy of the response (headers, content...)
+                    return copy.deepcopy(cached[1])
+
         try:
             resp = super().request(method, full_url, *args, **kwargs)
             self.raise_if_error(resp)
+            if key and resp.ok:
+                self._cache_set(key, resp)
             return resp
         except requests.RequestException as exc:
             logging.exception(exc)
@@ -82,16 +139,27 @@ class ApiClient(requests.Session):
         self.token_expiry = self.decode_token_expiry(self.token)
         self._refresh_token = json_data["refresh"]
         self.headers.update({"Authorization": f"Bearer {self.token}"})
-        adapter = HTTPAdapter(
-            max_retries=Retry(
-                total=3,
-                backoff_factor=5,
-                allowed_methods=["HEAD", "GET"],
-                status_forcelist=[429, 500, 502, 503, 504],
-            )
-        )
-        self.mount("https://", adapter)
-        self.mount("http://", adapter)
+
+    def clear_cache(self) -> None:
+        """
+        Forgets all cached responses
+        """
+        with self._cache_lock:
+            self._cache.clear()
+
+    def _cache_set(self, key: str, resp: requests.Response) -> None:
+        """
+        Caches a copy of a response, evicting expired responses and then the least recently used ones
+        """
+        now = monotonic()
+        resp = copy.deepcopy(resp)
+        with self._cache_lock:
+            self._cache[key] = (now, resp)
+            self._cache.move_to_end(key)
+            for expired in [k for k, (cached_at, _) in self._cache.items() if now - cached_at >= self.cache_ttl]:
+                del self._cache[expired]
+            while len(self._cache) > CACHE_MAXSIZE:
+                self._cache.popitem(last=False)
 
     def refresh_session(self) -> None:
         """
@@ -99,6 +167,7 @@ class ApiClient(requests.Session):
         """
         response = self.request("POST", "/api/token/refresh/", json={"refresh": self._refresh_token})
         self.token = response.json()["access"]
+        self.token_expiry = self.decode_token_expiry(self.token)
         self.headers.update({"Authorization": f"Bearer {self.token}"})
 
     def raise_if_error(self, response: requests.Response) -> None:
@@ -116,6 +185,7 @@ class ApiClient(requests.Session):
         response.raise_for_status()
 
     @staticmethod
+    @lru_cache(maxsize=64)
     def decode_token_expiry(token: str) -> Union[datetime, None]:
         """
         Decodes base64 encoded JWT token and returns expiry time from 'exp' field of the JWT token
@@ -128,7 +198,14 @@ class ApiClient(requests.Session):
         >>> decode_token_expiry(token = "eyJhbGciOiJIUzI1NiJ9.eyJSb2xlIjoiQWRtaW4iLCJJc3N1ZXIiOiJJc3N1ZXIiLCJVc2VybmFt\\
         ZSI6IkphdmFJblVzZSIsImV4cCI6MTcxNzY5MDEwNCwiaWF0IjoxNzE3NzYwMTA0fQ._pXcqDw0QgvznvNuhVPwYyIms3H5imH-q6A7lIQJjYQ")
         """
-        decoded_token = jwt.decode(token, options={"verify_signature": False})
+        # only the "exp" claim of the payload is needed and the signature is not verified: decode the payload
+        # segment directly instead of going through a JWT library
+        try:
+            payload = token.split(".")[1]
+            payload += "=" * (-len(payload) % 4)
+            decoded_token = json.loads(base64.urlsafe_b64decode(payload))
+        except (IndexError, ValueError):
+            return None
         exp_timestamp = decoded_token.get("exp")
         if exp_timestamp:
             return datetime.fromtimestamp(exp_timestamp, timezone.utc)
@@ -6,3 +6,16 @@ def test_periods_range():
     end = "202002"
     periods = get_range(start, end)
     assert len(periods) == 11
+
+
+def test_periods_range_days():
+    periods = get_range("20231230", "20240302")
+    assert len(periods) == 64
+    assert str(periods[0]) == "20231230"
+    assert str(periods[61]) == "20240229"
+    assert str(periods[-1]) == "20240302"
+
+
+def test_periods_range_weeks():
+    periods = get_range("2023W51", "2024W2")
+    assert [str(pe) for pe in periods] == ["2023W51", "2023W52", "2024W1", "2024W2"]
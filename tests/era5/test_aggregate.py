@@ -0,0 +1,58 @@
+"""Unit tests for ERA5 spatial and temporal aggregation."""
+
+from datetime import date, timedelta
+
+import geopandas as gpd
+import numpy as np
+import polars as pl
+from epiweeks import Week
+from rasterio.features import rasterize
+from rasterio.transform import from_bounds
+from shapely.geometry import box
+
+from openhexa.toolbox.era5.aggregate import _epi_week, build_masks
+
+
+def _reference_masks(boundaries: gpd.GeoDataFrame, height: int, width: int, transform) -> np.ndarray:
+    """Rasterize each boundary separately."""
+    return np.stack(
+        [
+            rasterize([geom], out_shape=(height, width), fill=0, all_touched=True, transform=transform) == 1
+            for geom in boundaries.geometry
+        ]
+    )
+
+
+def test_build_masks_disjoint():
+    boundaries = gpd.GeoDataFrame(geometry=[box(0.2, 0.2, 2.8, 2.8), box(6.2, 6.2, 9.8, 9.8)])
+    transform = from_bounds(0, 0, 10, 10, 10, 10)
+    masks = build_masks(boundaries, 10, 10, transform)
+    assert masks.shape == (2, 10, 10)
+    assert masks.dtype == np.bool_
+    np.testing.assert_array_equal(masks, _reference_masks(boundaries, 10, 10, transform))
+
+
+def test_build_masks_overlapping():
+    boundaries = gpd.GeoDataFrame(
+        geometry=[box(0, 0, 5, 5), box(3, 3, 8, 8), box(5, 0, 10, 5), box(0.5, 6.5, 2.5, 9.5)]
+    )
+    transform = from_bounds(0, 0, 10, 10, 10, 10)
+    masks = build_masks(boundaries, 10, 10, transform)
+    np.testing.assert_array_equal(masks, _reference_masks(boundaries, 10, 10, transform))
+
+
+def test_epi_week():
+    dates = [date(2014, 12, 1) + timedelta(days=i) for i in range(3 * 366)]
+    df = pl.DataFrame({"date": dates}).with_columns(_epi_week(pl.col("date")).alias("epi_week"))
+    expected = [f"{Week.fromdate(d).year}W{Week.fromdate(d).week}" for d in dates]
+    assert df["epi_week"].to_list() == expected
+
+
+def test_build_masks_cached():
+    boundaries = gpd.GeoDataFrame(geometry=[box(0, 0, 5, 5), box(3, 3, 8, 8)])
+    transform = from_bounds(0, 0, 10, 10, 10, 10)
+    masks = build_masks(boundaries, 10, 10, transform)
+    assert build_masks(boundaries.copy(), 10, 10, transform) is masks
+    assert not masks.flags.writeable
+    build_masks.cache_clear()
+    assert build_masks(boundaries, 10, 10, transform) is not masks
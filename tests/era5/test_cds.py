@@ -2,7 +2,11 @@
 
 from __future__ import annotations
 
+import json
+from calendar import monthrange
+from contextlib import ExitStack
 from datetime import datetime
+from time import monotonic
 from unittest.mock import Mock, patch
 
 import datapi
@@ -11,6 +15,12 @@ import pytest
 from openhexa.toolbox.era5.cds import (
     CDS,
     DataRequest,
+    RateLimiter,
+    build_request,
+    date_range,
+    iter_chunks,
+    list_datetimes_in_dir,
+    request_key,
 )
 
 
@@ -156,3 +166,101 @@ def test_cds_get_remote_from_request(
     assert remote
     assert remote.request_uid == "73dc0d2d-8288-4041-a84d-87e70772d5a8"
     assert remote.request["request"] == tp_request.__dict__
+
+
+def test_request_key(tp_request: DataRequest):
+    same_request = DataRequest(**tp_request.__dict__)
+    assert request_key(tp_request) == request_key(same_request)
+    same_request.day = ["01"]
+    assert request_key(tp_request) != request_key(same_request)
+
+
+@pytest.mark.parametrize("year,month", [(2024, 1), (2024, 2), (2023, 2), (2024, 4), (2024, 12)])
+def test_build_request_includes_last_day_of_month(year: int, month: int):
+    request = build_request(variable="total_precipitation", year=year, month=month)
+    assert request.day[0] == "01"
+    assert request.day[-1] == f"{monthrange(year, month)[1]:02}"
+
+
+def test_date_range():
+    drange = date_range(datetime(2024, 2, 27), datetime(2024, 3, 2))
+    assert len(drange) == 5
+    assert drange[0] == datetime(2024, 2, 27)
+    assert drange[2] == datetime(2024, 2, 29)
+    assert drange[-1] == datetime(2024, 3, 2)
+    assert date_range(datetime(2024, 3, 2), datetime(2024, 2, 27)) == []
+
+
+def test_iter_chunks():
+    dtimes = [datetime(2024, 12, 30), datetime(2024, 12, 2), datetime(2025, 1, 1), datetime(2024, 12, 2, 12)]
+    chunks = list(iter_chunks(dtimes))
+    assert chunks == [
+        {"year": "2024", "month": "12", "day": ["02", "30"]},
+        {"year": "2025", "month": "01", "day": ["01"]},
+    ]
+
+
+def test_rate_limiter():
+    limiter = RateLimiter(calls_per_minute=1200)
+    start = monotonic()
+    for _ in range(3):
+        limiter.wait()
+    assert monotonic() - start >= 0.1
+
+
+
+def test_list_datetimes_in_dir_corrupted_manifest(tmp_path):
+    """A truncated manifest is ignored and replaced."""
+    manifest_path = tmp_path / ".manifest.json"
+    manifest_path.write_text('{"202412_uid.grib": {"mtime": 1')
+    assert list_datetimes_in_dir(tmp_path, manifest_path=manifest_path) == []
+    assert json.loads(manifest_path.read_text()) == {}
+    assert [fp.name for fp in tmp_path.iterdir()] == [".manifest.json"]
+
+@pytest.fixture
+def fake_download(fake_cds: CDS):
+    """Patch the CDS API calls made by download_between, with an empty output directory."""
+
+    def download_remote(remote, dst_dir):
+        dst_file = dst_dir / f"{remote.request_uid}.grib"
+        dst_file.touch()
+        return dst_file
+
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(CDS, "latest", new=datetime(2025, 1, 1).astimezone()))
+        stack.enter_context(patch.object(CDS, "get_remote_requests", return_value=[]))
+        stack.enter_context(patch.object(CDS, "_download_remote", side_effect=download_remote))
+        stack.enter_context(patch("openhexa.toolbox.era5.cds.list_datetimes_in_dir", return_value=[]))
+        mock_submit = stack.enter_context(patch.object(CDS, "submit"))
+        mock_submit.return_value = Mock(request_uid="new-uid", status="successful", results_ready=True)
+        yield mock_submit
+
+
+def test_download_between_failed_resumed_request(fake_cds: CDS, fake_download: Mock, tmp_path):
+    """A failed request from a previous run is submitted again and stale entries are pruned."""
+    start, end = datetime(2024, 12, 1).astimezone(), datetime(2024, 12, 5).astimezone()
+    request = next(
+        build_request(variable="total_precipitation", data_format="grib", area=[16, -6, 9, 3], **chunk)
+        for chunk in iter_chunks(date_range(start, end))
+    )
+    inflight_path = tmp_path / ".inflight.json"
+    inflight_path.write_text(json.dumps({request_key(request): "failed-uid", "other-key": "stale-uid"}))
+    failed = Mock(request_uid="failed-uid", status="failed")
+
+    with patch.object(fake_cds.client, "get_remote", return_value=failed):
+        fake_cds.download_between(start, end, "total_precipitation", [16, -6, 9, 3], tmp_path, wait=0)
+
+    fake_download.assert_called_once_with(request)
+    assert json.loads(inflight_path.read_text()) == {}
+
+
+def test_download_between_corrupted_inflight(fake_cds: CDS, fake_download: Mock, tmp_path):
+    """A truncated .inflight.json is ignored and its requests are submitted again."""
+    inflight_path = tmp_path / ".inflight.json"
+    inflight_path.write_text('{"key": "uid')
+    start, end = datetime(2024, 12, 1).astimezone(), datetime(2024, 12, 5).astimezone()
+
+    fake_cds.download_between(start, end, "total_precipitation", [16, -6, 9, 3], tmp_path, wait=0)
+
+    fake_download.assert_called_once()
+    assert json.loads(inflight_path.read_text()) == {}
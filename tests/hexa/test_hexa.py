@@ -54,6 +54,124 @@ class TestOpenHEXAClient:
                 hexa.authenticate(with_credentials=("username", "password"))
                 assert str(e) == "Login failed : you need to disable two-factor authentication."
 
+    def test_query_cache(self):
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org", cache_ttl=60)
+        mock_response = self._mock_response({"data": {"me": {"user": {"id": "1"}}}})
+        mock_response.status_code = 200
+
+        with mock.patch.object(hexa, "_graphql_request", return_value=mock_response) as mock_request:
+            assert hexa.query("{ me { user { id } } }") == {"me": {"user": {"id": "1"}}}
+            assert hexa.query("{ me { user { id } } }") == {"me": {"user": {"id": "1"}}}
+            assert mock_request.call_count == 1
+
+            hexa.query("mutation { logout { success } }")
+            hexa.query("mutation { logout { success } }")
+            assert mock_request.call_count == 3
+
+            hexa.clear_cache()
+            hexa.query("{ me { user { id } } }")
+            assert mock_request.call_count == 4
+
+    def test_query_cache_bounded(self):
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org", cache_ttl=60)
+        mock_response = self._mock_response({"data": {"me": {"user": {"id": "1"}}}})
+        mock_response.status_code = 200
+
+        with mock.patch.object(hexa, "_graphql_request", return_value=mock_response) as mock_request:
+            # callers get their own copy of cached results
+            hexa.query("{ me { user { id } } }")["me"]["user"]["id"] = "2"
+            assert hexa.query("{ me { user { id } } }") == {"me": {"user": {"id": "1"}}}
+            assert mock_request.call_count == 1
+
+            with mock.patch("openhexa.toolbox.hexa.api.CACHE_MAXSIZE", 2):
+                hexa.query("{ a: me { user { id } } }")
+                hexa.query("{ b: me { user { id } } }")
+            assert len(hexa._cache) == 2
+            hexa.query("{ me { user { id } } }")
+            assert mock_request.call_count == 4
+
+    def test_query_disk_cache(self, tmp_path):
+        mock_response = self._mock_response({"data": {"me": {"user": {"id": "1"}}}})
+        mock_response.status_code = 200
+
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org", cache_ttl=60, cache_dir=tmp_path)
+        hexa.authenticate(with_token="token")
+        with mock.patch.object(hexa, "_graphql_request", return_value=mock_response) as mock_request:
+            hexa.query("{ me { user { id } } }")
+            assert mock_request.call_count == 1
+
+        # results persisted by a previous client are reused, but only with the same credentials
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org", cache_ttl=60, cache_dir=tmp_path)
+        hexa.authenticate(with_token="token")
+        with mock.patch.object(hexa, "_graphql_request", return_value=mock_response) as mock_request:
+            assert hexa.query("{ me { user { id } } }") == {"me": {"user": {"id": "1"}}}
+            assert mock_request.call_count == 0
+
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org", cache_ttl=60, cache_dir=tmp_path)
+        hexa.authenticate(with_token="other-token")
+        with mock.patch.object(hexa, "_graphql_request", return_value=mock_response) as mock_request:
+            hexa.query("{ me { user { id } } }")
+            assert mock_request.call_count == 1
+
+    def test_batch_query(self):
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org")
+        data = {"q0_me": {"user": {"id": "1"}}, "q1_pipelines": {"items": []}, "q1_total": 0}
+
+        with mock.patch.object(hexa, "query", return_value=data) as mock_query:
+            results = hexa.batch_query(
+                [
+                    ("{ me { user { id } } }", None),
+                    (
+                        "query($slug: String!) { pipelines(workspaceSlug: $slug) { items { code } } total: count }",
+                        {"slug": "ws"},
+                    ),
+                ]
+            )
+
+        assert results == [{"me": {"user": {"id": "1"}}}, {"pipelines": {"items": []}, "total": 0}]
+        document, variables = mock_query.call_args.args
+        assert document.startswith("query Batch($q1_slug: String!)")
+        assert "q0_me: me" in document
+        assert "q1_pipelines: pipelines(workspaceSlug: $q1_slug)" in document
+        assert "q1_total: count" in document
+        assert variables == {"q1_slug": "ws"}
+
+    def test_batch_query_mutation(self):
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org")
+
+        with mock.patch.object(hexa, "query", side_effect=[{"me": None}, {"logout": {"success": True}}]) as mock_query:
+            results = hexa.batch_query([("{ me { user { id } } }", None), ("mutation { logout { success } }", None)])
+
+        assert results == [{"me": None}, {"logout": {"success": True}}]
+        assert mock_query.call_count == 2
+
+    @pytest.mark.parametrize(
+        "operation,expected_header,expected_selection",
+        [
+            (
+                '{ pipelines(name: "price is $5") { items { code } } }',
+                "query Batch {",
+                'q0_pipelines: pipelines(name: "price is $5")',
+            ),
+            ("{\n  # don't { break\n  me { user { id } }\n}", "query Batch {", "q0_me: me { user { id } }"),
+            (
+                "query($in: Filter = {a: 1}) { pipelines(filter: $in) { items { code } } }",
+                "query Batch($q0_in: Filter = {a: 1}) {",
+                "q0_pipelines: pipelines(filter: $q0_in)",
+            ),
+        ],
+    )
+    def test_batch_query_literals(self, operation, expected_header, expected_selection):
+        hexa = OpenHEXAClient("https://app.demo.openhexa.org")
+
+        with mock.patch.object(hexa, "query", return_value={}) as mock_query:
+            hexa.batch_query([(operation, None)])
+
+        document, _ = mock_query.call_args.args
+        assert document.startswith(expected_header)
+        assert expected_selection in document
+        assert "#" not in document
+
 
 @mock.patch("openhexa.toolbox.hexa.hexa.OpenHEXAClient")
 class TestOpenHEXA:
@@ -63,12 +181,38 @@ class TestOpenHEXA:
         with mock.patch.object(hexa, "query", return_value=openhexa_mocked_workspaces):
             assert hexa.get_workspaces() == openhexa_mocked_workspaces
 
+    def test_batch_query(self, mock_hexa_client):
+        hexa = OpenHEXA("http://localhost:3000", token="token")
+        operations = [("{ me { user { id } } }", None), ("{ workspaces { totalItems } }", None)]
+        hexa.client.batch_query.return_value = [{"me": None}, {"workspaces": {"totalItems": 0}}]
+
+        assert hexa.batch_query(operations) == [{"me": None}, {"workspaces": {"totalItems": 0}}]
+        hexa.client.batch_query.assert_called_once_with(operations)
+
     def test_get_pipelines(self, mock_hexa_client):
         hexa = OpenHEXA("http://localhost:3000", token="token")
 
         with mock.patch.object(hexa, "query", return_value=openhexa_mocked_workspaces_pipelines):
             assert hexa.get_pipelines("slug") == openhexa_mocked_workspaces_pipelines
 
+    def test_iter_pipelines(self, mock_hexa_client):
+        hexa = OpenHEXA("http://localhost:3000", token="token")
+        pages = {
+            page: {"pipelines": {"items": [{"code": f"p{page}"}], "totalItems": 3, "totalPages": 3}}
+            for page in range(1, 4)
+        }
+
+        with mock.patch.object(hexa, "query", side_effect=lambda _, variables: pages[variables["page"]]):
+            assert [pipeline["code"] for pipeline in hexa.iter_pipelines("slug", per_page=1)] == ["p1", "p2", "p3"]
+
+    def test_iter_workspaces_single_page(self, mock_hexa_client):
+        hexa = OpenHEXA("http://localhost:3000", token="token")
+        data = {"workspaces": {"items": [{"slug": "ws", "name": "WS"}], "totalItems": 1, "totalPages": 1}}
+
+        with mock.patch.object(hexa, "query", return_value=data) as mock_query:
+            assert list(hexa.iter_workspaces()) == [{"slug": "ws", "name": "WS"}]
+            assert mock_query.call_count == 1
+
     def test_get_pipeline_not_found(self, mock_hexa_client):
         hexa = OpenHEXA("http://localhost:3000", token="token")
 
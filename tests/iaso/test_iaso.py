@@ -1,3 +1,5 @@
+from datetime import datetime, timezone
+
 import pytest
 import responses
 
@@ -5,6 +7,7 @@ from openhexa.toolbox.iaso import IASO
 from openhexa.toolbox.iaso.api_client import ApiClient
 from tests.iaso.fixtures.iaso_api_fixtures import (
     iaso_mocked_auth_token,
+    iaso_mocked_expired_auth_token,
     iaso_mocked_forms,
     iaso_mocked_orgunits,
     iaso_mocked_refreshed_auth_token,
@@ -124,3 +127,53 @@ class TestIasoAPI:
         iaso.get_forms([781], [149])
         assert mock_responses.calls[2].request.url == "https://iaso-staging.bluesquare.org/api/token/refresh/"
         assert iaso.api_client.token == iaso_mocked_refreshed_auth_token["access"]
+
+    def test_refresh_token_before_expiry(self, mock_responses):
+        mock_responses.add(
+            responses.POST,
+            "https://iaso-staging.bluesquare.org/api/token/",
+            json=iaso_mocked_expired_auth_token,
+            status=200,
+        )
+        mock_responses.add(
+            responses.POST,
+            "https://iaso-staging.bluesquare.org/api/token/refresh/",
+            json=iaso_mocked_refreshed_auth_token,
+            status=200,
+        )
+        mock_responses.add(
+            responses.GET, "https://iaso-staging.bluesquare.org/api/projects/", json=iaso_mocked_projects, status=200
+        )
+        iaso = IASO("https://iaso-staging.bluesquare.org", "user", "test")
+        iaso.get_projects()
+        assert [call.request.url for call in mock_responses.calls] == [
+            "https://iaso-staging.bluesquare.org/api/token/",
+            "https://iaso-staging.bluesquare.org/api/token/refresh/",
+            "https://iaso-staging.bluesquare.org/api/projects/?page=1&limit=10",
+        ]
+        assert iaso.api_client.token == iaso_mocked_refreshed_auth_token["access"]
+        assert iaso.api_client.token_expiry > datetime.now(timezone.utc)
+
+    def test_get_cache(self, mock_responses, monkeypatch):
+        mock_responses.add(
+            responses.POST, "https://iaso-staging.bluesquare.org/api/token/", json=iaso_mocked_auth_token, status=200
+        )
+        for name in ("projects", "forms", "orgunits"):
+            mock_responses.add(
+                responses.GET, f"https://iaso-staging.bluesquare.org/api/{name}/", json={"name": name}, status=200
+            )
+
+        client = ApiClient("https://iaso-staging.bluesquare.org", "username", "password", cache_ttl=60)
+        client.get("api/projects").headers["X-Modified"] = "1"
+        cached = client.get("api/projects")
+        assert cached.json() == {"name": "projects"}
+        assert "X-Modified" not in cached.headers
+        assert len(mock_responses.calls) == 2
+
+        # least recently used responses are evicted first
+        monkeypatch.setattr("openhexa.toolbox.iaso.api_client.CACHE_MAXSIZE", 2)
+        client.get("api/forms")
+        client.get("api/orgunits")
+        client.get("api/orgunits")
+        client.get("api/projects")
+        assert len(mock_responses.calls) == 5